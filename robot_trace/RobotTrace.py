@@ -24,6 +24,8 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 #
+import atexit
+import collections
 import enum
 import functools
 import re
@@ -31,32 +33,23 @@ import shutil
 import subprocess
 import sys
 import time
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable
 from typing import Literal
 
 
-@functools.total_ordering
-class Verbosity(enum.Enum):
+class Verbosity(enum.IntEnum):
     QUIET = 0
     NORMAL = 1
     DEBUG = 2
 
-    def __eq__(self, value):
-        if isinstance(value, Verbosity):
-            return self.value == value.value
-        return NotImplemented
-
-    def __lt__(self, other):
-        if isinstance(other, Verbosity):
-            return self.value < other.value
-        return NotImplemented
-
     @classmethod
     def from_string(cls, s):
-        s = s.upper()
-        if s in cls.__members__:
-            return cls[s]
-        return cls.NORMAL
+        return cls.__members__.get(s.upper(), cls.NORMAL)
+
+
+# Matches ANSI SGR (color and style) escape sequences. Deliberately unanchored
+# so it can be searched from an arbitrary position.
+_ANSI_RE = re.compile(r"\033\[[0-9;]*m")
 
 
 # ANSI escape codes for colors and styles.
@@ -146,13 +139,33 @@ class ANSI:
     @staticmethod
     def len(text: str) -> int:
         """Return the length of the text, ignoring ANSI escape codes."""
-        return len(re.sub(r"\033\[[0-9;]*m", "", text))
+        start = text.find("\033")
+        length = len(text)
+        if start < 0:
+            return length
+        # Only scan from the first escape, discounting each sequence found.
+        for match in _ANSI_RE.finditer(text, start):
+            length -= match.end() - match.start()
+        return length
+
+
+# Indentation strings for each trace depth, up to the maximum we indent to.
+_MAX_INDENT_DEPTH = 20
+_INDENTS = tuple("  " * i for i in range(_MAX_INDENT_DEPTH + 1))
+
+
+def _indent_lines(indent: str, lines: str) -> str:
+    if not indent:
+        return lines
+    return indent + lines.replace("\n", "\n" + indent)
 
 
 class TraceStack:
     def __init__(self, name: str):
         self.name = name
-        self._trace: str = ""
+        # Trace fragments, only joined when the trace is read. Deferred
+        # fragments are stored as (indent, format_callback) pairs.
+        self._trace_parts: list[str | tuple[str, Callable[[], str]]] = []
         self._depth: int = 0
         self._stack: list[str] = []
         self.has_warnings: bool = False
@@ -161,7 +174,7 @@ class TraceStack:
 
     def reset(self, name: str):
         self.name = name
-        self._trace = ""
+        self._trace_parts.clear()
         self._depth = 0
         self._stack.clear()
         self.has_warnings = False
@@ -170,11 +183,19 @@ class TraceStack:
 
     @property
     def _indent(self) -> str:
-        return "  " * min(self._depth, 20)
+        depth = self._depth
+        return _INDENTS[depth if depth < _MAX_INDENT_DEPTH else _MAX_INDENT_DEPTH]
 
     @property
     def trace(self) -> str:
-        return self._trace
+        return "".join(
+            part if isinstance(part, str) else _indent_lines(part[0], part[1]())
+            for part in self._trace_parts
+        )
+
+    @property
+    def has_trace(self) -> bool:
+        return bool(self._trace_parts)
 
     def push_keyword(self, keyword_line: str):
         self._stack.append(self._indent + keyword_line)
@@ -185,21 +206,54 @@ class TraceStack:
         self._depth -= 1
 
     def append_trace(self, trace_lines: str):
-        trace_lines = "\n".join(
-            self._indent + line for line in trace_lines.splitlines()
-        )
-        self._trace += trace_lines + "\n"
+        """Append newline-separated lines (without a trailing newline) to the
+        trace at the current indentation."""
+        self._trace_parts.append(_indent_lines(self._indent, trace_lines))
+        self._trace_parts.append("\n")
+
+    def append_deferred_trace(self, format_trace: Callable[[], str]):
+        """As append_trace, but the lines are only produced (by calling
+        format_trace) if and when the trace is read."""
+        self._trace_parts.append((self._indent, format_trace))
+        self._trace_parts.append("\n")
 
     def flush(self, decrement_depth: bool = True):
         """Flush any pending keyword headers to the trace and clear the stack."""
         if decrement_depth:
             self._depth -= 1
         for trace_line in self._stack:
-            self._trace += trace_line + "\n"
+            self._trace_parts.append(trace_line + "\n")
         self._stack.clear()
 
 
+# Keyword types whose headers always show an argument list, even when empty.
+_ARG_REQUIRED_TYPES = frozenset({"KEYWORD", "SETUP", "TEARDOWN"})
+
+
 class TracePrinter:
+    # Keyword status text and color, by keyword status.
+    _KEYWORD_STATUSES = {
+        "PASS": ("✓ PASS", ANSI.Fore.BRIGHT_GREEN),
+        "SKIP": ("→ SKIP", ANSI.Fore.YELLOW),
+        "FAIL": ("✗ FAIL", ANSI.Fore.BRIGHT_RED),
+        "NOT RUN": ("⊘ NOT RUN", ANSI.Fore.BRIGHT_BLACK),
+    }
+    # Log message prefix, by log level.
+    _LOG_LEVEL_INITIALS = {
+        level: level[0]
+        for level in ("ERROR", "FAIL", "WARN", "SKIP", "INFO", "HTML", "DEBUG", "TRACE")
+    }
+    # Log message color, by log level.
+    _LOG_LEVEL_COLORS = {
+        "ERROR": ANSI.Fore.BRIGHT_RED,
+        "FAIL": ANSI.Fore.BRIGHT_RED,
+        "WARN": ANSI.Fore.BRIGHT_YELLOW,
+        "SKIP": ANSI.Fore.YELLOW,
+        "INFO": ANSI.Fore.BRIGHT_BLACK,
+        "DEBUG": ANSI.Fore.WHITE,
+        "TRACE": ANSI.Fore.WHITE,
+    }
+
     def __init__(
         self,
         print_passed: bool,
@@ -219,6 +273,25 @@ class TracePrinter:
         self.colors = colors
         self.width = width
         self.print = print_callback
+        # Banner underlines, by length.
+        self._underlines: dict[int, str] = {}
+        # The status text is fixed for the run, so format it up front.
+        self._keyword_status_prefixes = {
+            status: f"  {color(text) if colors else text}    "
+            for status, (text, color) in self._KEYWORD_STATUSES.items()
+        }
+        # Whether to print, banner color and banner text, by test status.
+        self._test_status_info = {
+            "PASS": (print_passed, ANSI.Fore.GREEN, "TEST PASSED"),
+            "SKIP": (print_skipped, ANSI.Fore.YELLOW, "TEST SKIPPED"),
+            "FAIL": (print_failed, ANSI.Fore.RED, "TEST FAILED"),
+        }
+        # Banner text, by suite status.
+        self._suite_status_text = {
+            "PASS": "SUITE PASSED",
+            "SKIP": "SUITE SKIPPED",
+            "FAIL": "SUITE FAILED",
+        }
 
     def log_message_to_console(
         self, in_test: bool, message: str, stream: Literal["stdout", "stderr"]
@@ -226,69 +299,48 @@ class TracePrinter:
         self.print(f"Logged from test {stream}: {message.rstrip()}")
 
     def _format_banner(self, status_text: str, status_color, name: str) -> str:
+        # Measure before coloring, so only the name needs checking for escapes.
+        underline_length = min(self.width, len(status_text) + 2 + ANSI.len(name))
+        underline = self._underlines.get(underline_length)
+        if underline is None:
+            underline = "═" * underline_length
+            self._underlines[underline_length] = underline
         if self.colors and status_color:
             status_text = status_color(status_text)
-        status_line = f"{status_text}: {name}"
-        underline_length = min(self.width, ANSI.len(status_line))
-        underline = "═" * underline_length
-        return f"{status_line}\n{underline}"
+        return f"{status_text}: {name}\n{underline}"
 
     def _format_keyword_header(self, name: str, attributes: dict) -> str:
         kwtype = attributes["type"]
         args = attributes["args"]
         if kwtype != "KEYWORD":
             name = f"{kwtype}    {name}" if name else kwtype
-        if args or kwtype in {"KEYWORD", "SETUP", "TEARDOWN"}:
-            argstr = "(" + ", ".join(repr(a) for a in args) + ")"
+        if not args:
+            argstr = "()" if kwtype in _ARG_REQUIRED_TYPES else ""
+        elif len(args) == 1:
+            argstr = "(" + repr(args[0]) + ")"
         else:
-            argstr = ""
+            argstr = "(" + ", ".join(map(repr, args)) + ")"
         return f"▶ {name}{argstr}"
 
     def _format_keyword_status(self, status: str, elapsed_time_ms: int) -> str:
         elapsed = TestTimings.format_time(elapsed_time_ms / 1000)
-        if status == "PASS":
-            status_text = "✓ PASS"
-            if self.colors:
-                status_text = ANSI.Fore.BRIGHT_GREEN(status_text)
-            return f"  {status_text}    {elapsed}"
-        elif status == "SKIP":
-            status_text = "→ SKIP"
-            if self.colors:
-                status_text = ANSI.Fore.YELLOW(status_text)
-            return f"  {status_text}    {elapsed}"
-        elif status == "FAIL":
-            status_text = "✗ FAIL"
-            if self.colors:
-                status_text = ANSI.Fore.BRIGHT_RED(status_text)
-            return f"  {status_text}    {elapsed}"
-        elif status == "NOT RUN":
-            status_text = "⊘ NOT RUN"
-            if self.colors:
-                status_text = ANSI.Fore.BRIGHT_BLACK(status_text)
-            return f"  {status_text}    {elapsed}"
-        else:
+        prefix = self._keyword_status_prefixes.get(status)
+        if prefix is None:
             return f"  ? {status}    {elapsed}"
+        return prefix + elapsed
 
-    def _format_log_message(self, level: str, text: str, indent: str = "") -> list[str]:
-        level_initial = level[0].upper()
-        text_lines = text.splitlines()
-        lines = []
-        lines.append(f"{indent}{level_initial} {text_lines[0]}")
-        for text_line in text_lines[1:]:
-            lines.append(f"{indent}  {text_line}")
+    def _format_log_message(self, level: str, text: str, indent: str = "") -> str:
+        level_initial = self._LOG_LEVEL_INITIALS.get(level)
+        if level_initial is None:
+            level_initial = level[0].upper()
+        message = f"{indent}{level_initial} " + f"\n{indent}  ".join(text.splitlines())
 
         if self.colors:
-            if level == "ERROR" or level == "FAIL":
-                lines = [ANSI.Fore.BRIGHT_RED(line) for line in lines]
-            elif level == "WARN":
-                lines = [ANSI.Fore.BRIGHT_YELLOW(line) for line in lines]
-            elif level == "SKIP":
-                lines = [ANSI.Fore.YELLOW(line) for line in lines]
-            elif level == "INFO":
-                lines = [ANSI.Fore.BRIGHT_BLACK(line) for line in lines]
-            elif level == "DEBUG" or level == "TRACE":
-                lines = [ANSI.Fore.WHITE(line) for line in lines]
-        return lines
+            # Every line shares the level's color, so wrap the block once.
+            color = self._LOG_LEVEL_COLORS.get(level)
+            if color:
+                message = color(message)
+        return message
 
 
 class BufferedTracePrinter(TracePrinter):
@@ -302,13 +354,13 @@ class BufferedTracePrinter(TracePrinter):
         self.suite_trace_stack.reset(suite_name)
 
     def end_suite(self, name, attributes):
-        trace = self.suite_trace_stack.trace
-
         status = attributes["status"]
         status_text = ""
-        if trace:
+        if self.suite_trace_stack.has_trace:
             should_print = self.print_passed
-            status_text = "SUITE " + _past_tense(status)
+            status_text = self._suite_status_text.get(status)
+            if status_text is None:
+                status_text = "SUITE " + _past_tense(status)
             status_color = None
             if self.suite_trace_stack.has_failures:
                 should_print |= self.print_failed
@@ -325,8 +377,7 @@ class BufferedTracePrinter(TracePrinter):
                 banner = self._format_banner(
                     status_text, status_color, attributes["longname"]
                 )
-                if not trace:
-                    trace = attributes["message"] + "\n"
+                trace = self.suite_trace_stack.trace
                 self.print(f"{banner}\n{trace}")
 
     def start_test(self, name, attributes):
@@ -334,21 +385,15 @@ class BufferedTracePrinter(TracePrinter):
         self.test_trace_stack.reset(test_name)
 
     def end_test(self, name, attributes):
-        trace = self.test_trace_stack.trace
         status = attributes["status"]
         if status != "NOT RUN":
-            should_print = False
-            status_text = "TEST " + _past_tense(status)
-            status_color = None
-            if status == "PASS":
-                should_print = self.print_passed
-                status_color = ANSI.Fore.GREEN
-            elif status == "SKIP":
-                should_print = self.print_skipped
-                status_color = ANSI.Fore.YELLOW
-            elif status == "FAIL":
-                should_print = self.print_failed
-                status_color = ANSI.Fore.RED
+            status_info = self._test_status_info.get(status)
+            if status_info is not None:
+                should_print, status_color, status_text = status_info
+            else:
+                should_print = False
+                status_color = None
+                status_text = "TEST " + _past_tense(status)
             if self.test_trace_stack.has_errors:
                 should_print |= self.print_errored
                 status_text += " WITH ERRORS"
@@ -361,6 +406,7 @@ class BufferedTracePrinter(TracePrinter):
                 banner = self._format_banner(
                     status_text, status_color, attributes["longname"]
                 )
+                trace = self.test_trace_stack.trace
                 if not trace:
                     trace = attributes["message"] + "\n"
                 self.print(f"{banner}\n{trace}")
@@ -400,14 +446,26 @@ class BufferedTracePrinter(TracePrinter):
         elif level == "FAIL":
             stack.has_failures = True
 
-        lines = self._format_log_message(level, text)
-        stack.append_trace("\n".join(lines))
+        # Most traces are discarded (e.g. passing tests), so only format the
+        # message if the trace is printed.
+        stack.append_deferred_trace(
+            functools.partial(self._format_log_message, level, text)
+        )
 
 
 class LiveTracePrinter(TracePrinter):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.indent = 0
+        self._indent = ""
+
+    def _set_indent(self, indent: int):
+        self.indent = indent
+        # Live output is not capped, so fall back for unusually deep nesting.
+        if 0 <= indent <= _MAX_INDENT_DEPTH:
+            self._indent = _INDENTS[indent]
+        else:
+            self._indent = "  " * indent
 
     def start_suite(self, name, attributes):
         suite_name = attributes["longname"]
@@ -427,24 +485,22 @@ class LiveTracePrinter(TracePrinter):
 
     def start_keyword(self, in_test: bool, name, attributes):
         trace_line = self._format_keyword_header(name, attributes)
-        self.print(" " * self.indent * 2 + trace_line)
-        self.indent += 1
+        self.print(self._indent + trace_line)
+        self._set_indent(self.indent + 1)
 
     def end_keyword(self, in_test: bool, name, attributes):
-        self.indent -= 1
+        self._set_indent(self.indent - 1)
 
         status = attributes["status"]
 
         keyword_trace = self._format_keyword_status(status, attributes["elapsedtime"])
-        self.print(" " * self.indent * 2 + keyword_trace)
+        self.print(self._indent + keyword_trace)
 
     def log_message(self, in_test: bool, attributes):
         level = attributes["level"]
         text = attributes["message"]
 
-        indent = " " * self.indent * 2
-        lines = self._format_log_message(level, text, indent)
-        self.print("\n".join(lines))
+        self.print(self._format_log_message(level, text, self._indent))
 
 
 class TestStatistics:
@@ -452,32 +508,32 @@ class TestStatistics:
         self.top_level_test_count: int | None = None
         self.current_suite: str | None = None
         self.current_test: str | None = None
-        self.started_suites = []
-        self.started_tests = []
-        self.passed_tests = []
-        self.skipped_tests = []
-        self.failed_tests = []
-        self.completed_tests = []
-        self.completed_suites = []
+        self.started_suite_count = 0
+        self.started_test_count = 0
+        self.completed_suite_count = 0
+        self.completed_count = 0
+        self.passed_count = 0
+        self.skipped_count = 0
+        # Failing test names are kept for the run results.
+        self.failed_tests: list[str] = []
         self.warnings: dict[str, list[str]] = {}
         self.errors: dict[str, list[str]] = {}
 
     def start_suite(self, name, attributes):
         suite_name = attributes["longname"]
         self.current_suite = suite_name
-        self.started_suites.append(suite_name)
+        self.started_suite_count += 1
         if self.top_level_test_count is None:
             self.top_level_test_count = attributes["totaltests"]
 
     def end_suite(self, name, attributes):
-        suite_name = attributes["longname"]
         self.current_suite = None
-        self.completed_suites.append(suite_name)
+        self.completed_suite_count += 1
 
     def start_test(self, name, attributes):
         test_name = attributes["longname"]
         self.current_test = test_name
-        self.started_tests.append(test_name)
+        self.started_test_count += 1
 
     def end_test(self, name, attributes):
         status = attributes["status"]
@@ -485,13 +541,13 @@ class TestStatistics:
         self.current_test = None
         if status == "NOT RUN":
             return
-        self.completed_tests.append(test_name)
+        self.completed_count += 1
         if status == "PASS":
-            self.passed_tests.append(test_name)
+            self.passed_count += 1
         elif status == "FAIL":
             self.failed_tests.append(test_name)
         elif status == "SKIP":
-            self.skipped_tests.append(test_name)
+            self.skipped_count += 1
 
     def log_error(self, text: str):
         self.errors.setdefault(
@@ -504,18 +560,18 @@ class TestStatistics:
         ).append(text)
 
     def format_suite_progress(self) -> str:
-        return f"{len(self.started_suites):2d}"
+        return f"{self.started_suite_count:2d}"
 
     def format_test_progress(self) -> str:
-        return f"{len(self.started_tests):2d}/{self.top_level_test_count:2d}"
+        return f"{self.started_test_count:2d}/{self.top_level_test_count:2d}"
 
     def format_run_summary(self) -> str:
         plural = "s" if self.top_level_test_count != 1 else ""
         summary = (
             f"{self.top_level_test_count or 0} test{plural}, "
-            f"{len(self.completed_tests)} completed "
-            f"({len(self.passed_tests)} passed, "
-            f"{len(self.skipped_tests)} skipped, "
+            f"{self.completed_count} completed "
+            f"({self.passed_count} passed, "
+            f"{self.skipped_count} skipped, "
             f"{len(self.failed_tests)} failed)."
         )
         if self.errors:
@@ -551,9 +607,23 @@ class TestStatistics:
 
 
 class TestTimings:
+    # Formatted times, by whole second. Cleared if it grows past the limit.
+    _TIME_CACHE: dict[int, str] = {}
+    _TIME_CACHE_LIMIT = 4096
+
+    # The number of recent test durations the ETA is estimated from, and the
+    # number needed before they are used over the run's average.
+    _RECENT_TEST_COUNT = 16
+    _MIN_RECENT_TEST_COUNT = 3
+
     def __init__(self):
         self.run_start_time: float | None = None
         self.current_test_start_time: float | None = None
+        self._recent_test_durations: collections.deque[float] = collections.deque(
+            maxlen=self._RECENT_TEST_COUNT
+        )
+        # Median of the recent test durations, or None if it needs recomputing.
+        self._recent_median: float | None = None
 
     def _record_run_start(self):
         if self.run_start_time is None:
@@ -567,6 +637,10 @@ class TestTimings:
         self.current_test_start_time = time.time()
 
     def end_test(self):
+        if self.current_test_start_time is not None:
+            duration = time.time() - self.current_test_start_time
+            self._recent_test_durations.append(duration)
+            self._recent_median = None
         self.current_test_start_time = None
 
     @staticmethod
@@ -574,14 +648,22 @@ class TestTimings:
         if seconds is None:
             return "unknown"
         seconds = int(round(seconds))
+        cache = TestTimings._TIME_CACHE
+        formatted = cache.get(seconds)
+        if formatted is not None:
+            return formatted
         m, s = divmod(seconds, 60)
         h, m = divmod(m, 60)
         if h:
-            return f"{h:2d}h {m:2d}m {s:2d}s"
+            formatted = f"{h:2d}h {m:2d}m {s:2d}s"
         elif m:
-            return f"{m:2d}m {s:2d}s"
+            formatted = f"{m:2d}m {s:2d}s"
         else:
-            return f"{s:2d}s"
+            formatted = f"{s:2d}s"
+        if len(cache) >= TestTimings._TIME_CACHE_LIMIT:
+            cache.clear()
+        cache[seconds] = formatted
+        return formatted
 
     def get_elapsed_time(self) -> float:
         if self.run_start_time is None:
@@ -592,29 +674,75 @@ class TestTimings:
         return self.format_time(self.get_elapsed_time())
 
     def format_eta(self, stats: TestStatistics) -> str:
-        if stats.top_level_test_count and stats.completed_tests:
-            elapsed_time = self.get_elapsed_time()
-            avg_test_time = elapsed_time / len(stats.completed_tests)
-            remaining_tests = stats.top_level_test_count - len(stats.completed_tests)
+        if stats.top_level_test_count and stats.completed_count:
+            # Estimate from the median of the recent tests, which is steadier
+            # than the average when test durations vary wildly.
+            if len(self._recent_test_durations) >= self._MIN_RECENT_TEST_COUNT:
+                if self._recent_median is None:
+                    import statistics
+
+                    self._recent_median = statistics.median(self._recent_test_durations)
+                avg_test_time = self._recent_median
+            else:
+                avg_test_time = self.get_elapsed_time() / stats.completed_count
+            remaining_tests = stats.top_level_test_count - stats.completed_count
             eta_time = avg_test_time * remaining_tests
             return self.format_time(eta_time)
         return "unknown"
 
 
 class ProgressBox:
+    # Clear the current line and move the cursor up. Do this 5 times to clear
+    # the entire box (3 lines of text + top and bottom borders). Then clear the
+    # final line and reset the cursor to the start of the line.
+    _CLEAR_SEQUENCE = (
+        (ANSI.Cursor.CLEAR_LINE + ANSI.Cursor.UP()) * 4
+        + ANSI.Cursor.CLEAR_LINE
+        + ANSI.Cursor.HOME
+    )
+
     def __init__(self, stream, colors: bool, width: int = 120):
         self.stream = stream
         self.colors = colors
         self.width = width
-        self._lines = ["", "", ""]
         self._display_progress_bar = width >= 40
+        self._text_width = width - 4
+        # The borders only depend on the width, so build them once.
+        self._top_border = "┌" + "─" * (width - 2) + "┐\n"
+        self._bottom_border = "└" + "─" * (width - 2) + "┘"
+        self._progress_bar_left = "┌" + "─" * 6 + "┤"
+        self._progress_bar_right = "├" + "─" * 6 + "┐\n"
+        self._blank_row = "│ " + " " * self._text_width + " │\n"
+        # Each line of text as drawn in the box, rendered when it is written.
+        self._rows = [self._blank_row] * 3
+        # Cursor movement wrapping each text line: up from the bottom border to
+        # the line, then back down again.
+        self._line_prefixes = tuple(
+            ANSI.Cursor.UP(3 - line_no) + ANSI.Cursor.HOME + "│ "
+            for line_no in range(3)
+        )
+        self._line_suffixes = tuple(
+            " │" + ANSI.Cursor.DOWN(3 - line_no) for line_no in range(3)
+        )
         self._total_tasks = None
         self._task_statuses = []
+        # Whether the box has changed since it was last drawn.
+        self._stale = False
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the box is drawn at all."""
+        return self.stream is not None
 
     def draw(self):
         if not self.stream:
             return
+        self.stream.write(self.draw_sequence())
+        self.stream.flush()
 
+    def draw_sequence(self) -> str:
+        """Return the text which draws the box below the cursor."""
+        self._stale = False
         total_tasks = self._total_tasks
         if total_tasks is not None and self._display_progress_bar:
             # If we know the total number of tasks we will execute, draw the
@@ -650,21 +778,17 @@ class ProgressBox:
                     progress_bar += "█"
             progress_bar += "░" * bar_remaining
 
-            self.stream.write(
-                "┌" + "─" * 6 + "┤" + progress_bar + "├" + "─" * 6 + "┐\n"
-            )
+            parts = [self._progress_bar_left, progress_bar, self._progress_bar_right]
         else:
             # Otherwise just draw a solid top border.
-            self.stream.write("┌" + "─" * (self.width - 2) + "┐\n")
+            parts = [self._top_border]
 
-        # Write the three lines of text.
-        text_width = self.width - 4
-        for i in range(3):
-            self.stream.write(f"│ {self._lines[i]:<{text_width}.{text_width}} │\n")
+        # Add the three lines of text.
+        parts.extend(self._rows)
 
-        # Write the bottom border.
-        self.stream.write("└" + "─" * (self.width - 2) + "┘")
-        self.stream.flush()
+        # Add the bottom border.
+        parts.append(self._bottom_border)
+        return "".join(parts)
 
     @property
     def total_tasks(self) -> int | None:
@@ -679,28 +803,57 @@ class ProgressBox:
             self.clear()
             self.draw()
 
-    def add_task_status(self, status: str):
+    def add_task_status(self, status: str, redraw: bool = True):
         self._task_statuses.append(status)
-        self.clear()
-        self.draw()
+        if redraw:
+            self.clear()
+            self.draw()
+        else:
+            self._stale = True
+
+    def refresh(self):
+        """Redraw the box in a single write if it has changed since it was last
+        drawn."""
+        if not self.stream or not self._stale:
+            return
+        self.stream.write(self.clear_sequence() + self.draw_sequence())
+        self.stream.flush()
 
     def clear(self):
         if not self.stream:
             return
-        # Clear the current line and move the cursor up. Do this 5 times to
-        # clear the entire box (3 lines of text + top and bottom borders).
-        for _ in range(4):
-            self.stream.write(ANSI.Cursor.CLEAR_LINE + ANSI.Cursor.UP())
-        # Clear the final line and reset the cursor to the start of the line.
-        self.stream.write(ANSI.Cursor.CLEAR_LINE + ANSI.Cursor.HOME)
+        self.stream.write(self.clear_sequence())
         self.stream.flush()
 
+    def clear_sequence(self) -> str:
+        """Return the text which clears the box, leaving the cursor where the
+        box started."""
+        return self._CLEAR_SEQUENCE
+
+    def set_line(self, line_no: int, left_text: str = "", right_text: str = ""):
+        """Change a line of text without writing it. The box is marked stale,
+        to be written by the next draw or refresh."""
+        self._set_line(line_no, left_text, right_text)
+        self._stale = True
+
     def write_line(self, line_no: int, left_text: str = "", right_text: str = ""):
         if not self.stream:
             return
+        text = self._set_line(line_no, left_text, right_text)
+        # Move cursor to the line inside the box and write the text.
+        # For line 0, we want to move up 3 lines (to the first empty line in the box).
+        # For line 1, we want to move up 2 lines.
+        # For line 2, we want to move up 1 line.
+        # Then move the cursor back down to the bottom of the box.
+        self.stream.write(
+            self._line_prefixes[line_no] + text + self._line_suffixes[line_no]
+        )
+        self.stream.flush()
+
+    def _set_line(self, line_no: int, left_text: str, right_text: str) -> str:
         # Format the left and right text into a single line. Right text takes
         # priority. Truncate left text with '...' if necessary.
-        text_width = self.width - 4
+        text_width = self._text_width
         right_len = len(right_text)
         max_left = text_width - right_len - 1 if right_len > 0 else text_width
         max_left = max(0, max_left)
@@ -712,21 +865,17 @@ class ProgressBox:
         padding = max(0, text_width - len(left_text) - right_len)
         text = f"{left_text}{' ' * padding}{right_text}"
 
-        # Move cursor to the line inside the box and write the text.
-        # For line 0, we want to move up 3 lines (to the first empty line in the box).
-        # For line 1, we want to move up 2 lines.
-        # For line 2, we want to move up 1 line.
         assert line_no >= 0 and line_no < 3, "line_no must be between 0 and 2"
-        self._lines[line_no] = text
-        line_offset = 3 - line_no
-        self.stream.write(ANSI.Cursor.UP(line_offset))
-        self.stream.write(ANSI.Cursor.HOME + f"│ {text} │")
-        # Move cursor back down to the bottom of the box.
-        self.stream.write(ANSI.Cursor.DOWN(line_offset))
-        self.stream.flush()
+        # Render the row for redraws now, as lines are redrawn far more often
+        # than they change.
+        self._rows[line_no] = "│ " + text[:text_width].ljust(text_width) + " │\n"
+        return text
 
 
 class InterceptStream:
+    """Buffers writes to a stream, handing everything written since the last
+    flush to the callback as a single message when flushed."""
+
     def __init__(self, real_stream, write_callback):
         self._real_stream = real_stream
         self._write_callback = write_callback
@@ -737,13 +886,13 @@ class InterceptStream:
         return len(msg)
 
     def writelines(self, lines: Iterable[str]) -> None:
-        for line in lines:
-            self.write(line)
+        self.written_lines.extend(lines)
 
     def flush(self):
-        for line in self.written_lines:
-            self._write_callback(line)
+        msg = "".join(self.written_lines)
         self.written_lines.clear()
+        if msg:
+            self._write_callback(msg)
 
     # Forward everything else.
     def __getattr__(self, name):
@@ -776,6 +925,23 @@ class PopenWrapper:
         return getattr(self._real_popen, name)
 
 
+# Values of the colors argument which force colors on or off.
+_COLORS = {"ON": True, "ANSI": True, "OFF": False}
+# Values of the console_progress argument which select a specific stream.
+_CONSOLE_PROGRESS_STREAMS = {"STDOUT": "stdout", "STDERR": "stderr"}
+
+
+def _auto_colors(stdout_isatty: bool) -> bool:
+    """Whether to color output when the colors argument is AUTO."""
+    if not stdout_isatty:
+        return False
+    if sys.platform == "win32":
+        import importlib.util
+
+        return importlib.util.find_spec("colorama") is not None
+    return True
+
+
 class RobotTrace:
     ROBOT_LISTENER_API_VERSION = 2
 
@@ -788,39 +954,24 @@ class RobotTrace:
         width: int = 120,
     ):
         # Parse verbosity argument.
-        verbosity = verbosity.upper()
         self.verbosity = Verbosity.from_string(verbosity)
+        stdout_isatty = sys.stdout.isatty()
         # Parse colors argument.
-        colors = colors.upper()
-        if colors in {"ON", "ANSI"}:
-            self.colors = True
-        elif colors in {"OFF"}:
-            self.colors = False
-        else:  # Assume AUTO.
-            if sys.stdout.isatty():
-                if sys.platform == "win32":
-                    import importlib.util
-
-                    self.colors = importlib.util.find_spec("colorama") is not None
-                else:
-                    self.colors = True
-            else:
-                self.colors = False
+        self.colors = _COLORS.get(colors.upper())
+        if self.colors is None:  # Assume AUTO.
+            self.colors = _auto_colors(stdout_isatty)
         # Parse console_progress argument.
         console_progress = console_progress.upper()
         if console_progress == "AUTO":
-            if sys.stdout.isatty():
+            if stdout_isatty:
                 progress_stream = sys.stdout
             elif sys.stderr.isatty():
                 progress_stream = sys.stderr
             else:
                 progress_stream = None
-        elif console_progress == "STDOUT":
-            progress_stream = sys.stdout
-        elif console_progress == "STDERR":
-            progress_stream = sys.stderr
-        else:  # Assume NONE.
-            progress_stream = None
+        else:  # Assume NONE if not a known stream.
+            stream_name = _CONSOLE_PROGRESS_STREAMS.get(console_progress)
+            progress_stream = getattr(sys, stream_name) if stream_name else None
 
         # Configure output based on verbosity.
         self.live_output = self.verbosity >= Verbosity.DEBUG
@@ -839,6 +990,8 @@ class RobotTrace:
         )
         self.stats = TestStatistics()
         self.timings = TestTimings()
+        # Read on every keyword and log event, so kept as a plain attribute.
+        self._in_test = False
         if self.live_output:
             self.result_printer = LiveTracePrinter(
                 print_passed=self.print_passed,
@@ -886,14 +1039,19 @@ class RobotTrace:
         # this.
         # Thus, install an interceptor to catch all output on both streams. The
         # intercepted output can then be integrated into the formatted output.
-        self.real_stdout = sys.__stdout__
+        # Our own output goes to a copy of stdout with a large buffer. It is
+        # flushed per write when someone is watching it live, and otherwise at
+        # the end of each test and suite.
+        self.real_stdout = _buffered_stream(sys.__stdout__)
         self.real_stderr = sys.__stderr__
-        self.intercepted_stdout = InterceptStream(
-            self.real_stdout, lambda msg: self.log_message_to_console(msg, "stdout")
-        )
-        self.intercepted_stderr = InterceptStream(
-            self.real_stderr, lambda msg: self.log_message_to_console(msg, "stderr")
-        )
+        self._flush_writes = self.real_stdout.isatty()
+        if self.progress_box.stream is sys.__stdout__:
+            # Share the buffered stream, so progress and trace stay in order.
+            self.progress_box.stream = self.real_stdout
+        if self.real_stdout is not sys.__stdout__:
+            atexit.register(self.real_stdout.flush)
+        self.intercepted_stdout = InterceptStream(self.real_stdout, self._on_stdout)
+        self.intercepted_stderr = InterceptStream(self.real_stderr, self._on_stderr)
         sys.__stdout__ = self.intercepted_stdout
         sys.__stderr__ = self.intercepted_stderr
 
@@ -904,20 +1062,41 @@ class RobotTrace:
 
     @property
     def in_test(self) -> bool:
-        return self.timings.current_test_start_time is not None
+        return self._in_test
+
+    def _write(self, text: str):
+        self.real_stdout.write(text)
+        if self._flush_writes:
+            self.real_stdout.flush()
 
     def _writeln(self, text=""):
-        self.real_stdout.write(text + "\n")
+        self._write(text + "\n")
+
+    def _flush(self):
+        """Flush buffered output. Called at the end of each test and suite, so
+        their results are visible (and survive the run being killed) even when
+        stdout is not a terminal."""
         self.real_stdout.flush()
 
     def _print_trace(self, text: str):
+        progress_box = self.progress_box
+        if progress_box.stream is self.real_stdout:
+            # The progress box shares our stream, so clear it, print the trace
+            # text and redraw it in a single write.
+            self._write(
+                progress_box.clear_sequence()
+                + text
+                + "\n"
+                + progress_box.draw_sequence()
+            )
+            return
         # First clear the progress box, so we don't have to worry about
         # interleaving with the trace output.
-        self.progress_box.clear()
+        progress_box.clear()
         # Then print the trace text as normal.
         self._writeln(text)
         # Finally redraw the progress box with the current test progress.
-        self.progress_box.draw()
+        progress_box.draw()
 
     # ------------------------------------------------------------------ suite
 
@@ -929,62 +1108,72 @@ class RobotTrace:
         self.timings.start_suite()
         self.result_printer.start_suite(name, attributes)
 
-        self.progress_box.write_line(
-            0, f"[SUITE {self.stats.format_suite_progress()}] {suite_name}"
-        )
+        if self.progress_box.enabled:
+            self.progress_box.write_line(
+                0, f"[SUITE {self.stats.format_suite_progress()}] {suite_name}"
+            )
 
     def end_suite(self, name, attributes):
         self.stats.end_suite(name, attributes)
         self.result_printer.end_suite(name, attributes)
 
         self.progress_box.write_line(0)
+        self._flush()
 
     # ------------------------------------------------------------------ test
 
     def start_test(self, name, attributes):
+        self._in_test = True
         self.stats.start_test(name, attributes)
         self.timings.start_test()
         self.result_printer.start_test(name, attributes)
 
-        self.progress_box.write_line(
-            1,
-            f"[TEST {self.stats.format_test_progress()}] {name}",
-            f"(elapsed {self.timings.format_elapsed_time()}, "
-            f"ETA {self.timings.format_eta(self.stats)})",
-        )
+        if self.progress_box.enabled:
+            self.progress_box.write_line(
+                1,
+                f"[TEST {self.stats.format_test_progress()}] {name}",
+                f"(elapsed {self.timings.format_elapsed_time()}, "
+                f"ETA {self.timings.format_eta(self.stats)})",
+            )
 
     def end_test(self, name, attributes):
         self.stats.end_test(name, attributes)
         self.timings.end_test()
-        self.progress_box.add_task_status(attributes["status"])
-        self.progress_box.write_line(1)
+        self._in_test = False
+        # Update the box without drawing it, then draw it once: either along
+        # with the printed trace, or by the refresh if nothing was printed.
+        self.progress_box.add_task_status(attributes["status"], redraw=False)
+        if self.progress_box.enabled:
+            self.progress_box.set_line(1)
         self.result_printer.end_test(name, attributes)
+        self.progress_box.refresh()
+        self._flush()
 
     # ------------------------------------------------------------------ keyword
 
     def start_keyword(self, name, attributes):
-        self.result_printer.start_keyword(self.in_test, name, attributes)
+        self.result_printer.start_keyword(self._in_test, name, attributes)
+        if not self.progress_box.enabled:
+            return
 
-        kwtype = attributes["type"]
-        kwname = attributes["kwname"]
         args = attributes["args"]
-        if kwtype != "KEYWORD":
-            name = f"{kwtype}    {name}" if name else kwtype
-        if args or kwtype in {"KEYWORD", "SETUP", "TEARDOWN"}:
-            argstr = "(" + ", ".join(repr(a) for a in args) + ")"
+        if args or attributes["type"] in _ARG_REQUIRED_TYPES:
+            # Anything beyond the box width is truncated by write_line anyway.
+            budget = self.progress_box.width
+            argstr = "(" + _join_repr_truncated(args, budget) + ")"
         else:
             argstr = ""
-        self.progress_box.write_line(2, f"[{kwname}]  {argstr}")
+        self.progress_box.write_line(2, f"[{attributes['kwname']}]  {argstr}")
 
     def end_keyword(self, name, attributes):
-        self.result_printer.end_keyword(self.in_test, name, attributes)
+        self.result_printer.end_keyword(self._in_test, name, attributes)
 
         self.progress_box.write_line(2)
 
     # ------------------------------------------------------------------ logging
 
     def log_message(self, attributes):
-        self.result_printer.log_message(self.in_test, attributes)
+        self.result_printer.log_message(self._in_test, attributes)
         level = attributes["level"]
         text = attributes["message"]
 
@@ -994,7 +1183,13 @@ class RobotTrace:
             self.stats.log_warning(text)
 
     def log_message_to_console(self, message: str, stream: Literal["stdout", "stderr"]):
-        self.result_printer.log_message_to_console(self.in_test, message, stream)
+        self.result_printer.log_message_to_console(self._in_test, message, stream)
+
+    def _on_stdout(self, message: str):
+        self.log_message_to_console(message, "stdout")
+
+    def _on_stderr(self, message: str):
+        self.log_message_to_console(message, "stderr")
 
     # ------------------------------------------------------------------ close
 
@@ -1015,7 +1210,42 @@ class RobotTrace:
             elapsed_str = self.timings.format_elapsed_time()
             self._writeln(f"Total elapsed: {elapsed_str}.")
 
-
+        self._flush()
+
+
+def _buffered_stream(stream, buffer_size: int = 65536):
+    """Return a text stream writing to the same file as stream, but with a
+    buffer of buffer_size bytes. Returns stream itself if it has no file."""
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError, ValueError):
+        return stream
+    stream.flush()
+    return open(
+        fd,
+        "w",
+        buffering=buffer_size,
+        encoding=stream.encoding,
+        errors=stream.errors,
+        closefd=False,
+    )
+
+
+def _join_repr_truncated(args: Iterable, budget: int) -> str:
+    """Return the reprs of args joined with ", ", stopping once the result is
+    longer than budget characters."""
+    parts = []
+    length = -2  # No separator before the first part.
+    for arg in args:
+        part = repr(arg)
+        parts.append(part)
+        length += len(part) + 2
+        if length > budget:
+            break
+    return ", ".join(parts)
+
+
+@functools.lru_cache(maxsize=64)
 def _past_tense(verb: str) -> str:
     is_upper = verb.isupper()
     is_title = verb.istitle()
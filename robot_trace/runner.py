@@ -24,9 +24,45 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 #
+import collections
 import subprocess
 import sys
 
+# Normalizes long option names: lowercase, with hyphens removed.
+_OPTION_NAME_TABLE = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz", "-"
+)
+# Options which take a value, mapped to the listener setting they set.
+_VALUE_OPTIONS = {
+    "-C": "colors",
+    "--consolecolors": "colors",
+    "-W": "width",
+    "--consolewidth": "width",
+    "--consoleprogress": "console_progress",
+}
+# Options which take no value, mapped to the listener setting and value they set.
+_FLAG_OPTIONS = {
+    "--tracesubprocesses": ("trace_subprocesses", "True"),
+    "--verbose": ("verbosity", "DEBUG"),
+    "--quiet": ("verbosity", "QUIET"),
+}
+# Our custom options, which are not passed through to Robot.
+_CUSTOM = frozenset(
+    {"--consoleprogress", "--verbose", "--quiet", "--tracesubprocesses"}
+)
+# Robot's stderr is only shown on internal errors, so only keep the last
+# _STDERR_TAIL_CHUNKS reads of it (64 KiB).
+_STDERR_CHUNK_SIZE = 4096
+_STDERR_TAIL_CHUNKS = 16
+# The listener settings, in the order they are passed to the listener.
+_LISTENER_SETTINGS = (
+    "colors",
+    "width",
+    "console_progress",
+    "trace_subprocesses",
+    "verbosity",
+)
+
 
 def main():
     args = sys.argv[1:]
@@ -57,18 +93,14 @@ def main():
     # - --verbose
     # - --quiet
     robot_args = []
-    console_colors = None
-    console_width = None
-    console_progress = None
-    trace_subprocesses = False
-    verbosity = None
+    settings = {}
 
     arg_iter = iter(args)
     for arg in arg_iter:
         # Normalize argument to determine its name and potential inline value.
         if arg.startswith("--"):
             parts = arg.split("=", 1)
-            name = "--" + parts[0][2:].lower().replace("-", "")
+            name = "--" + parts[0][2:].translate(_OPTION_NAME_TABLE)
             value = parts[1] if len(parts) > 1 else None
         elif arg.startswith("-") and len(arg) > 2 and arg[1] != "-":
             name = arg[:2]
@@ -77,59 +109,31 @@ def main():
             name = arg
             value = None
 
-        # Extract value from the next argument if needed and not inline.
-        needs_value = name in {
-            "-C",
-            "--consolecolors",
-            "-W",
-            "--consolewidth",
-            "--consoleprogress",
-        }
+        # Capture specific arguments, extracting the value from the next
+        # argument if needed and not inline.
         consumed_next = False
-        if needs_value and value is None:
-            try:
-                value = next(arg_iter)
-                consumed_next = True
-            except StopIteration:
-                pass
-
-        # Capture specific arguments.
-        if name in {"-C", "--consolecolors"}:
-            console_colors = value
-        elif name in {"-W", "--consolewidth"}:
-            console_width = value
-        elif name == "--consoleprogress":
-            console_progress = value
-        elif name == "--tracesubprocesses":
-            trace_subprocesses = True
-        elif name == "--verbose":
-            verbosity = "DEBUG"
-        elif name == "--quiet":
-            verbosity = "QUIET"
+        setting = _VALUE_OPTIONS.get(name)
+        if setting is not None:
+            if value is None:
+                value = next(arg_iter, None)
+                consumed_next = value is not None
+            settings[setting] = value
+        elif name in _FLAG_OPTIONS:
+            setting, flag_value = _FLAG_OPTIONS[name]
+            settings[setting] = flag_value
 
         # Reconstruct robot_args, omitting our custom arguments.
-        if name not in {
-            "--consoleprogress",
-            "--verbose",
-            "--quiet",
-            "--tracesubprocesses",
-        }:
+        if name not in _CUSTOM:
             robot_args.append(arg)
-            if consumed_next and value is not None:
+            if consumed_next:
                 robot_args.append(value)
 
     # Build the command to run robot.
     listener = "robot_trace"
-    if console_colors is not None:
-        listener += f":colors={console_colors}"
-    if console_width is not None:
-        listener += f":width={console_width}"
-    if console_progress is not None:
-        listener += f":console_progress={console_progress}"
-    if trace_subprocesses:
-        listener += ":trace_subprocesses=True"
-    if verbosity is not None:
-        listener += f":verbosity={verbosity}"
+    for setting in _LISTENER_SETTINGS:
+        value = settings.get(setting)
+        if value is not None:
+            listener += f":{setting}={value}"
     cmd = [
         "robot",
         "--console=quiet",
@@ -139,11 +143,22 @@ def main():
     ]
 
     try:
-        result = subprocess.run(cmd, stderr=subprocess.PIPE)
+        with subprocess.Popen(cmd, stderr=subprocess.PIPE) as process:
+            try:
+                stderr_tail = collections.deque(
+                    iter(lambda: process.stderr.read(_STDERR_CHUNK_SIZE), b""),
+                    maxlen=_STDERR_TAIL_CHUNKS,
+                )
+                returncode = process.wait()
+            except BaseException:
+                # As subprocess.run does, don't leave robot running behind us
+                # (e.g. on Ctrl-C).
+                process.kill()
+                raise
         # If the process failed because of an internal error (likely when
         # parsing arguments or in the listener itself), print the error message.
-        if result.returncode > 250:
-            sys.stderr.write(result.stderr.decode())
-        sys.exit(result.returncode)
+        if returncode > 250:
+            sys.stderr.write(b"".join(stderr_tail).decode(errors="replace"))
+        sys.exit(returncode)
     except KeyboardInterrupt:
         sys.exit(130)
@@ -1,21 +1,48 @@
+import functools
+import re
+import tempfile
 import unittest
 from io import StringIO
+from types import MappingProxyType
 from unittest.mock import patch
 
 from robot_trace.RobotTrace import (
+    _ANSI_RE,
     ANSI,
     InterceptStream,
     ProgressBox,
     RobotTrace,
     TestStatistics,
     TestTimings,
+    TracePrinter,
     TraceStack,
     Verbosity,
     _ANSICode,
+    _buffered_stream,
+    _join_repr_truncated,
     _past_tense,
 )
 
 
+@functools.lru_cache(maxsize=8)
+def _make_listener(verbosity: str = "NORMAL") -> RobotTrace:
+    """Build a listener without its interceptors replacing the real streams,
+    and without it querying the real terminal. Listeners are shared between
+    callers, so must not be modified."""
+    with (
+        patch("sys.__stdout__", new_callable=StringIO),
+        patch("sys.__stderr__", new_callable=StringIO),
+        patch("sys.stdout.isatty", return_value=False),
+    ):
+        return RobotTrace(verbosity=verbosity, console_progress="NONE")
+
+
+def setUpModule():
+    # Build a listener up front, so one-off initialization isn't charged to
+    # whichever test happens to run first.
+    _make_listener()
+
+
 class RobotTraceTestBase(unittest.TestCase):
     def setUp(self):
         super().setUp()
@@ -35,12 +62,32 @@ class RobotTraceTestBase(unittest.TestCase):
         sys.__stderr__ = self.orig_stderr
 
 
+class PatchedTimeTestBase(unittest.TestCase):
+    """Patches time.time once for the whole class, resetting it to 100.0 before
+    each test."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._time_patcher = patch("time.time")
+        cls.mock_time = cls._time_patcher.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._time_patcher.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.mock_time.return_value = 100.0
+
+
 class TestVerbosity(unittest.TestCase):
     def test_equality(self):
-        self.assertEqual(Verbosity.QUIET, Verbosity.QUIET)
+        self.assertIs(Verbosity.QUIET, Verbosity.QUIET)
 
     def test_inequality(self):
-        self.assertNotEqual(Verbosity.QUIET, Verbosity.NORMAL)
+        self.assertIsNot(Verbosity.QUIET, Verbosity.NORMAL)
 
     def test_ordering_less_than(self):
         self.assertLess(Verbosity.QUIET, Verbosity.NORMAL)
@@ -49,19 +96,30 @@ class TestVerbosity(unittest.TestCase):
         self.assertLess(Verbosity.NORMAL, Verbosity.DEBUG)
 
     def test_from_string_lowercase(self):
-        self.assertEqual(Verbosity.from_string("quiet"), Verbosity.QUIET)
+        self.assertIs(Verbosity.from_string("quiet"), Verbosity.QUIET)
 
     def test_from_string_uppercase(self):
-        self.assertEqual(Verbosity.from_string("NORMAL"), Verbosity.NORMAL)
+        self.assertIs(Verbosity.from_string("NORMAL"), Verbosity.NORMAL)
 
     def test_from_string_mixed_case(self):
-        self.assertEqual(Verbosity.from_string("DeBuG"), Verbosity.DEBUG)
+        self.assertIs(Verbosity.from_string("DeBuG"), Verbosity.DEBUG)
 
     def test_from_string_invalid(self):
-        self.assertEqual(Verbosity.from_string("invalid"), Verbosity.NORMAL)
+        self.assertIs(Verbosity.from_string("invalid"), Verbosity.NORMAL)
+
+    def test_from_string_returns_member(self):
+        self.assertIs(Verbosity.from_string("quiet"), Verbosity.from_string("QUIET"))
+        self.assertIs(Verbosity.from_string("quiet"), Verbosity.QUIET)
 
 
 class TestANSI(unittest.TestCase):
+    CASES = (
+        ("Hello \033[31mWorld\033[0m!", 12),
+        ("\033[1;32mOK\033[0m", 2),
+        ("plain", 5),
+        ("", 0),
+    )
+
     def test_ansicode_call(self):
         code = _ANSICode("\033[31m")
         result = code("Hello")
@@ -71,54 +129,181 @@ class TestANSI(unittest.TestCase):
         text = "Hello \033[31mWorld\033[0m!"
         self.assertEqual(ANSI.len(text), 12)  # "Hello World!"
 
+    def test_ansi_len_plain(self):
+        self.assertEqual(ANSI.len("Hello World!"), 12)
+
+    def test_ansi_len_unterminated_escape(self):
+        self.assertEqual(ANSI.len("Hello \033[31"), 10)
+
+    def test_ansi_len_large(self):
+        text = "Hello \033[31mWorld\033[0m! " * 256
+        self.assertEqual(ANSI.len(text), len("Hello World! ") * 256)
+
+    def test_ansi_len_cases(self):
+        for text, expected in self.CASES:
+            with self.subTest(text=text):
+                self.assertEqual(ANSI.len(text), expected)
+
+    def test_ansi_regex_precompiled(self):
+        self.assertIsInstance(_ANSI_RE, re.Pattern)
+        self.assertEqual(
+            _ANSI_RE.findall("\033[1;32mOK\033[0m"), ["\033[1;32m", "\033[0m"]
+        )
+
 
 class TestTraceStack(unittest.TestCase):
-    def test_initial_state_trace(self):
-        stack = TraceStack("test")
-        self.assertEqual(stack.trace, "")
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stack = TraceStack("test")
 
-    def test_initial_state_errors(self):
-        stack = TraceStack("test")
-        self.assertFalse(stack.has_errors)
+    def setUp(self):
+        super().setUp()
+        self.stack.reset("test")
 
-    def test_initial_state_warnings(self):
+    def test_initial_state(self):
         stack = TraceStack("test")
-        self.assertFalse(stack.has_warnings)
+        with self.subTest(field="trace"):
+            self.assertEqual(stack.trace, "")
+        with self.subTest(field="has_errors"):
+            self.assertFalse(stack.has_errors)
+        with self.subTest(field="has_warnings"):
+            self.assertFalse(stack.has_warnings)
 
     def test_push_keyword(self):
-        stack = TraceStack("test")
-        stack.push_keyword("Keyword A")
-        self.assertEqual(stack._depth, 1)
+        self.stack.push_keyword("Keyword A")
+        self.assertEqual(self.stack._depth, 1)
 
     def test_pop_keyword(self):
-        stack = TraceStack("test")
-        stack.push_keyword("Keyword A")
-        stack.pop_keyword()
-        self.assertEqual(stack._depth, 0)
+        self.stack.push_keyword("Keyword A")
+        self.stack.pop_keyword()
+        self.assertEqual(self.stack._depth, 0)
 
     def test_flush_keyword_depth(self):
-        stack = TraceStack("test")
-        stack.push_keyword("Keyword A")
-        stack.flush()
-        self.assertEqual(stack._depth, 0)
+        self.stack.push_keyword("Keyword A")
+        self.stack.flush()
+        self.assertEqual(self.stack._depth, 0)
 
     def test_flush_keyword_trace_content(self):
-        stack = TraceStack("test")
-        stack.push_keyword("Keyword A")
-        stack.flush()
-        self.assertIn("Keyword A", stack.trace)
+        self.stack.push_keyword("Keyword A")
+        self.stack.flush()
+        self.assertIn("Keyword A", self.stack.trace)
 
     def test_append_trace(self):
-        stack = TraceStack("test")
-        stack.push_keyword("Keyword A")
-        stack.append_trace("Hello world")
-        self.assertEqual("  Hello world\n", stack.trace)
+        self.stack.push_keyword("Keyword A")
+        self.stack.append_trace("Hello world")
+        self.assertEqual("  Hello world\n", self.stack.trace)
 
     def test_append_multiline_trace(self):
-        stack = TraceStack("test")
-        stack.push_keyword("Keyword A")
-        stack.append_trace("Hello world\nLine 2")
-        self.assertEqual("  Hello world\n  Line 2\n", stack.trace)
+        self.stack.push_keyword("Keyword A")
+        self.stack.append_trace("Hello world\nLine 2")
+        self.assertEqual("  Hello world\n  Line 2\n", self.stack.trace)
+
+    def test_append_deferred_trace(self):
+        calls = []
+
+        def format_trace():
+            calls.append(1)
+            return "Hello world\nLine 2"
+
+        self.stack.push_keyword("Keyword A")
+        self.stack.append_deferred_trace(format_trace)
+        self.assertTrue(self.stack.has_trace)
+        self.assertEqual(calls, [])
+        self.assertEqual("  Hello world\n  Line 2\n", self.stack.trace)
+        self.assertEqual(calls, [1])
+
+    def test_append_trace_indent_capped(self):
+        for i in range(25):
+            self.stack.push_keyword(f"Keyword {i}")
+        self.stack.append_trace("Deep")
+        self.assertEqual("  " * 20 + "Deep\n", self.stack.trace)
+
+    def test_reset_clears_state(self):
+        self.stack.push_keyword("Keyword A")
+        self.stack.flush(decrement_depth=False)
+        self.stack.append_trace("Hello world")
+        self.stack.has_errors = True
+        self.stack.reset("other")
+        self.assertEqual(self.stack.name, "other")
+        self.assertEqual(self.stack._depth, 0)
+        self.assertEqual(self.stack.trace, "")
+        self.assertFalse(self.stack.has_trace)
+        self.assertFalse(self.stack.has_errors)
+
+
+class TestTracePrinter(unittest.TestCase):
+    def _printer(self, colors: bool) -> TracePrinter:
+        return TracePrinter(
+            print_passed=False,
+            print_skipped=False,
+            print_warned=True,
+            print_errored=True,
+            print_failed=True,
+            colors=colors,
+            width=80,
+            print_callback=lambda text: None,
+        )
+
+    def test_format_keyword_status_plain(self):
+        printer = self._printer(colors=False)
+        self.assertEqual(
+            printer._format_keyword_status("PASS", 2000), "  ✓ PASS     2s"
+        )
+
+    def test_format_keyword_status_colored(self):
+        printer = self._printer(colors=True)
+        expected = f"  {ANSI.Fore.BRIGHT_RED('✗ FAIL')}     2s"
+        self.assertEqual(printer._format_keyword_status("FAIL", 2000), expected)
+
+    def test_format_keyword_status_unknown(self):
+        printer = self._printer(colors=True)
+        self.assertEqual(printer._format_keyword_status("ODD", 2000), "  ? ODD     2s")
+
+    def test_format_banner_colored(self):
+        printer = self._printer(colors=True)
+        banner = printer._format_banner("TEST PASSED", ANSI.Fore.GREEN, "Suite.Test")
+        expected = f"{ANSI.Fore.GREEN('TEST PASSED')}: Suite.Test\n" + "═" * 23
+        self.assertEqual(banner, expected)
+
+    def test_format_banner_width_capped(self):
+        printer = self._printer(colors=False)
+        banner = printer._format_banner("TEST FAILED", None, "T" * 100)
+        self.assertTrue(banner.endswith("\n" + "═" * 80))
+
+    def test_format_keyword_header(self):
+        printer = self._printer(colors=False)
+        cases = (
+            ("KEYWORD", [], "▶ Log()"),
+            ("KEYWORD", ["a"], "▶ Log('a')"),
+            ("KEYWORD", ["a", 1], "▶ Log('a', 1)"),
+            ("FOR", [], "▶ FOR    Log"),
+        )
+        for kwtype, args, expected in cases:
+            with self.subTest(kwtype=kwtype, args=args):
+                header = printer._format_keyword_header(
+                    "Log", {"type": kwtype, "args": args}
+                )
+                self.assertEqual(header, expected)
+
+    def test_format_log_message_colored(self):
+        printer = self._printer(colors=True)
+        message = printer._format_log_message("WARN", "One\nTwo")
+        self.assertEqual(message, ANSI.Fore.BRIGHT_YELLOW("W One\n  Two"))
+
+    def test_format_log_message_indented(self):
+        printer = self._printer(colors=False)
+        message = printer._format_log_message("INFO", "One\nTwo", "  ")
+        self.assertEqual(message, "  I One\n    Two")
+
+
+# Read-only test attributes, shared by the statistics tests.
+_PASS_TEST_ATTRIBUTES = MappingProxyType(
+    {"status": "PASS", "longname": "My_Suite.My Test"}
+)
+_FAIL_TEST_ATTRIBUTES = MappingProxyType(
+    {"status": "FAIL", "longname": "My_Suite.My Test"}
+)
 
 
 class TestTestStatistics(unittest.TestCase):
@@ -132,88 +317,164 @@ class TestTestStatistics(unittest.TestCase):
     def test_start_test_increment(self):
         stats = TestStatistics()
         stats.start_test("My Test", {"longname": "My_Suite.My Test"})
-        self.assertEqual(len(stats.started_tests), 1)
+        self.assertEqual(stats.started_test_count, 1)
 
     def test_end_test_pass(self):
         stats = TestStatistics()
-        attributes = {"status": "PASS", "longname": "My_Suite.My Test"}
-
-        stats.end_test("My Test", attributes)
-        self.assertEqual(len(stats.completed_tests), 1)
-        self.assertEqual(len(stats.passed_tests), 1)
+        stats.end_test("My Test", _PASS_TEST_ATTRIBUTES)
+        self.assertEqual(stats.completed_count, 1)
+        self.assertEqual(stats.passed_count, 1)
 
     def test_end_test_fail(self):
         stats = TestStatistics()
-        attributes = {"status": "FAIL", "longname": "My_Suite.My Test"}
-
-        stats.end_test("My Test", attributes)
-        self.assertEqual(len(stats.completed_tests), 1)
-        self.assertEqual(len(stats.failed_tests), 1)
-
-
-class TestTestTimings(unittest.TestCase):
-    def test_format_time_none(self):
-        self.assertEqual(TestTimings.format_time(None), "unknown")
-
-    def test_format_time_seconds_only(self):
-        self.assertEqual(TestTimings.format_time(45), "45s")
-
-    def test_format_time_minutes_seconds(self):
-        self.assertEqual(TestTimings.format_time(125), " 2m  5s")
+        stats.end_test("My Test", _FAIL_TEST_ATTRIBUTES)
+        self.assertEqual(stats.completed_count, 1)
+        self.assertEqual(stats.failed_tests, ["My_Suite.My Test"])
+
+
+class TestTestTimings(PatchedTimeTestBase):
+    FORMAT_TIME_CASES = (
+        (None, "unknown"),
+        (45, "45s"),
+        (125, " 2m  5s"),
+        (3665, " 1h  1m  5s"),
+    )
+
+    def test_format_time(self):
+        for seconds, expected in self.FORMAT_TIME_CASES:
+            with self.subTest(seconds=seconds):
+                self.assertEqual(TestTimings.format_time(seconds), expected)
+
+    def test_format_time_cached(self):
+        self.assertEqual(TestTimings.format_time(61.4), " 1m  1s")
+        self.assertIn(61, TestTimings._TIME_CACHE)
+        self.assertEqual(TestTimings.format_time(60.6), " 1m  1s")
+
+    def test_format_time_batch(self):
+        # Enough distinct values to overflow the cache, so it is cleared and
+        # refilled part way through.
+        formatted = {
+            seconds: TestTimings.format_time(seconds)
+            for seconds in range(0, 100_000, 7)
+        }
+        self.assertEqual(formatted[0], " 0s")
+        self.assertEqual(formatted[126], " 2m  6s")
+        self.assertEqual(formatted[3605], " 1h  0m  5s")
+        self.assertEqual(formatted[99_995], "27h 46m 35s")
+        self.assertLessEqual(
+            len(TestTimings._TIME_CACHE), TestTimings._TIME_CACHE_LIMIT
+        )
 
-    def test_format_time_hours_minutes_seconds(self):
-        self.assertEqual(TestTimings.format_time(3665), " 1h  1m  5s")
+    def test_format_time_reuses_strings(self):
+        for seconds, _ in self.FORMAT_TIME_CASES:
+            with self.subTest(seconds=seconds):
+                self.assertIs(
+                    TestTimings.format_time(seconds), TestTimings.format_time(seconds)
+                )
 
-    @patch("time.time", return_value=100.0)
-    def test_elapsed_time(self, mock_time):
+    def test_elapsed_time(self):
         timings = TestTimings()
         timings.start_suite()
-        mock_time.return_value = 110.0
+        self.mock_time.return_value = 110.0
         self.assertEqual(timings.get_elapsed_time(), 10.0)
 
 
-class TestRobotTraceHelper(RobotTraceTestBase):
-    def setUp(self):
-        super().setUp()
-        self.listener = RobotTrace(verbosity="NORMAL", console_progress="NONE")
-
-    def test_past_tense_upper_pass(self):
-        self.assertEqual(_past_tense("PASS"), "PASSED")
-
-    def test_past_tense_upper_fail(self):
-        self.assertEqual(_past_tense("FAIL"), "FAILED")
-
-    def test_past_tense_upper_skip(self):
-        self.assertEqual(_past_tense("SKIP"), "SKIPPED")
-
-    def test_past_tense_lower(self):
-        self.assertEqual(_past_tense("pass"), "passed")
-
-    def test_past_tense_title_try(self):
-        self.assertEqual(_past_tense("Try"), "Tried")
+class TestRobotTraceHelper(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # None of these tests change the listeners, so they are shared.
+        cls.listeners = {
+            verbosity: _make_listener(verbosity)
+            for verbosity in ("QUIET", "NORMAL", "DEBUG")
+        }
+        cls.listener_states = {
+            verbosity: cls._listener_state(listener)
+            for verbosity, listener in cls.listeners.items()
+        }
 
-    def test_past_tense_title_stop(self):
-        self.assertEqual(_past_tense("Stop"), "Stopped")
+    def tearDown(self):
+        # The listeners are shared, so no test may modify them.
+        for verbosity, listener in self.listeners.items():
+            self.assertEqual(
+                self._listener_state(listener), self.listener_states[verbosity]
+            )
+        super().tearDown()
 
-    def test_verbosity_settings_debug(self):
-        listener = RobotTrace(verbosity="DEBUG", console_progress="NONE")
-        self.assertTrue(listener.print_passed)
-        self.assertTrue(listener.print_skipped)
-        self.assertTrue(listener.print_failed)
+    @staticmethod
+    def _listener_state(listener: RobotTrace) -> tuple:
+        return (
+            listener.verbosity,
+            listener.print_passed,
+            listener.print_skipped,
+            listener.print_warned,
+            listener.print_failed,
+            listener.stats.started_test_count,
+            listener.stats.completed_count,
+            listener.in_test,
+        )
 
-    def test_verbosity_settings_quiet(self):
-        listener_quiet = RobotTrace(verbosity="QUIET", console_progress="NONE")
-        self.assertFalse(listener_quiet.print_passed)
-        self.assertTrue(listener_quiet.print_failed)
+    PAST_TENSE_CASES = (
+        ("PASS", "PASSED"),
+        ("FAIL", "FAILED"),
+        ("SKIP", "SKIPPED"),
+        ("pass", "passed"),
+        ("Try", "Tried"),
+        ("Stop", "Stopped"),
+    )
+
+    def test_past_tense(self):
+        for verb, expected in self.PAST_TENSE_CASES:
+            with self.subTest(verb=verb):
+                self.assertEqual(_past_tense(verb), expected)
+
+    def test_past_tense_reuses_strings(self):
+        for verb, _ in self.PAST_TENSE_CASES:
+            with self.subTest(verb=verb):
+                self.assertIs(_past_tense(verb), _past_tense(verb))
+
+    def test_join_repr_truncated(self):
+        self.assertEqual(_join_repr_truncated(["a", 1], 80), "'a', 1")
+        self.assertEqual(_join_repr_truncated([], 80), "")
+
+    def test_join_repr_truncated_stops_past_budget(self):
+        joined = _join_repr_truncated(range(1000), 20)
+        self.assertGreater(len(joined), 20)
+        self.assertEqual(joined, ", ".join(map(repr, range(len(joined.split(", "))))))
+        self.assertLess(len(joined), 30)
+
+    # Expected (print_passed, print_skipped, print_warned, print_failed).
+    VERBOSITY_SETTINGS = {
+        "QUIET": (False, False, False, True),
+        "NORMAL": (False, False, True, True),
+        "DEBUG": (True, True, True, True),
+    }
+
+    def test_listeners_shared(self):
+        self.assertIs(_make_listener("NORMAL"), self.listeners["NORMAL"])
+
+    def test_verbosity_settings(self):
+        for verbosity, expected in self.VERBOSITY_SETTINGS.items():
+            with self.subTest(verbosity=verbosity):
+                listener = self.listeners[verbosity]
+                self.assertEqual(
+                    (
+                        listener.print_passed,
+                        listener.print_skipped,
+                        listener.print_warned,
+                        listener.print_failed,
+                    ),
+                    expected,
+                )
 
 
 class TestStatisticsFormatReturns(unittest.TestCase):
     def test_format_run_results_all_zero(self):
         stats = TestStatistics()
         stats.top_level_test_count = 0
-        stats.completed_tests = []
-        stats.passed_tests = []
-        stats.skipped_tests = []
+        stats.completed_count = 0
+        stats.passed_count = 0
+        stats.skipped_count = 0
         stats.failed_tests = []
 
         expected = "0 tests, 0 completed (0 passed, 0 skipped, 0 failed)."
@@ -222,9 +483,9 @@ class TestStatisticsFormatReturns(unittest.TestCase):
     def test_format_run_results_one_test(self):
         stats = TestStatistics()
         stats.top_level_test_count = 1
-        stats.completed_tests = ["t1"]
-        stats.passed_tests = ["t1"]
-        stats.skipped_tests = []
+        stats.completed_count = 1
+        stats.passed_count = 1
+        stats.skipped_count = 0
         stats.failed_tests = []
 
         expected = "1 test, 1 completed (1 passed, 0 skipped, 0 failed)."
@@ -233,9 +494,9 @@ class TestStatisticsFormatReturns(unittest.TestCase):
     def test_format_run_results_with_errors_and_warnings(self):
         stats = TestStatistics()
         stats.top_level_test_count = 2
-        stats.completed_tests = ["t1", "t2"]
-        stats.passed_tests = ["t1"]
-        stats.skipped_tests = []
+        stats.completed_count = 2
+        stats.passed_count = 1
+        stats.skipped_count = 0
         stats.failed_tests = ["t2"]
         stats.errors = {"t1": ["Error 1"]}
         stats.warnings = {"t1": ["Warn 1"]}
@@ -257,23 +518,53 @@ class TestStatisticsFormatReturns(unittest.TestCase):
         self.assertIn("Warning test:\n- t1:\n  - warn 1", res)
 
 
-class TestTimingsFormatETA(unittest.TestCase):
-    @patch("time.time", return_value=120.0)
-    def test_format_eta_calculates(self, mock_time):
+class TestTimingsFormatETA(PatchedTimeTestBase):
+    def test_format_eta_calculates(self):
+        self.mock_time.return_value = 120.0
         timings = TestTimings()
         timings.run_start_time = 100.0  # elapsed = 20s
 
         stats = TestStatistics()
-        stats.completed_tests = [1, 2, 3, 4, 5]
+        stats.completed_count = 5
         stats.top_level_test_count = 15
 
         # 5 tests took 20s -> 4s per test. 10 remaining -> 40s
         self.assertEqual(timings.format_eta(stats), "40s")
 
+    def test_format_eta_uses_recent_median(self):
+        timings = TestTimings()
+        timings.start_suite()
+        for duration in (1.0, 2.0, 30.0):
+            timings.start_test()
+            self.mock_time.return_value += duration
+            timings.end_test()
+
+        stats = TestStatistics()
+        stats.completed_count = 3
+        stats.top_level_test_count = 13
+
+        # Median of 1s, 2s and 30s is 2s. 10 remaining -> 20s
+        self.assertEqual(timings.format_eta(stats), "20s")
+
+    def test_format_eta_median_updated_per_test(self):
+        timings = TestTimings()
+        timings.start_suite()
+        stats = TestStatistics()
+        stats.top_level_test_count = 14
+        for duration in (1.0, 2.0, 3.0, 4.0):
+            timings.start_test()
+            self.mock_time.return_value += duration
+            timings.end_test()
+            stats.completed_count += 1
+            timings.format_eta(stats)
+
+        # Median of 1s, 2s, 3s and 4s is 2.5s. 10 remaining -> 25s
+        self.assertEqual(timings.format_eta(stats), "25s")
+
     def test_format_eta_unknown(self):
         timings = TestTimings()
         stats = TestStatistics()
-        stats.completed_tests = []
+        stats.completed_count = 0
         self.assertEqual(timings.format_eta(stats), "unknown")
 
 
@@ -328,9 +619,15 @@ class TestInterceptStream(unittest.TestCase):
         stream.write("hello")
         stream.write("world")
         stream.flush()
-        self.assertEqual(received, ["hello", "world"])
+        self.assertEqual(received, ["helloworld"])
         self.assertEqual(stream.written_lines, [])
 
+    def test_flush_empty(self):
+        received = []
+        stream = InterceptStream(None, lambda x: received.append(x))
+        stream.flush()
+        self.assertEqual(received, [])
+
     def test_getattr(self):
         class DummyStream:
             def dummy_method(self):
@@ -415,15 +712,36 @@ class TestProgressBox(unittest.TestCase):
         left = "A" * 100
         right = "B" * 10
         self.box.write_line(0, left, right)
-        line = self.box._lines[0]
-        self.assertTrue(line.endswith("BBBBBBBBBB"))
+        row = self.box._rows[0]
+        self.assertTrue(row.endswith("BBBBBBBBBB │\n"))
         expected_left_len = self.box.width - 4 - 10 - 1
-        self.assertTrue(line.startswith("A" * (expected_left_len - 3) + "..."))
+        self.assertTrue(row.startswith("│ " + "A" * (expected_left_len - 3) + "..."))
+
+    def test_refresh_only_when_stale(self):
+        self.box.refresh()
+        self.assertEqual(self.stream.getvalue(), "")
+
+        self.box.set_line(1, "left")
+        self.box.add_task_status("PASS", redraw=False)
+        self.assertEqual(self.stream.getvalue(), "")
+        self.box.refresh()
+        output = self.stream.getvalue()
+        self.assertTrue(output.startswith(self.box.clear_sequence()))
+        self.assertIn("│ left", output)
+
+        self.stream.truncate(0)
+        self.stream.seek(0)
+        self.box.refresh()
+        self.assertEqual(self.stream.getvalue(), "")
 
     def test_clear(self):
         self.box.clear()
         self.assertIn(ANSI.Cursor.CLEAR_LINE, self.stream.getvalue())
 
+    def test_enabled(self):
+        self.assertTrue(self.box.enabled)
+        self.assertFalse(ProgressBox(None, False, 80).enabled)
+
     def test_none_stream(self):
         box_none = ProgressBox(None, 80)
         box_none.draw()
@@ -449,7 +767,7 @@ class TestRobotTraceLifecycle(RobotTraceTestBase):
         attributes = {"suites": [1], "totaltests": 1, "longname": "My_Suite"}
 
         self.listener.start_suite("My_Suite", attributes)
-        self.assertEqual(len(self.listener.stats.started_suites), 1)
+        self.assertEqual(self.listener.stats.started_suite_count, 1)
 
         end_attributes = {"status": "PASS", "longname": "My_Suite", "message": ""}
         self.listener.end_suite("My_Suite", end_attributes)
@@ -471,7 +789,7 @@ class TestRobotTraceLifecycle(RobotTraceTestBase):
         }
         self.listener.end_test("My Test", end_test_attributes)
         self.assertFalse(self.listener.in_test)
-        self.assertEqual(len(self.listener.stats.passed_tests), 1)
+        self.assertEqual(self.listener.stats.passed_count, 1)
         self.assertEqual(self.listener.progress_box._task_statuses, ["PASS"])
 
     def test_test_lifecycle_fail_with_errors(self):
@@ -491,6 +809,41 @@ class TestRobotTraceLifecycle(RobotTraceTestBase):
         self.listener.end_test("My Test", end_test_attributes)
         self.assertEqual(len(self.listener.stats.failed_tests), 1)
 
+    def test_end_test_writes_progress_once(self):
+        listener = RobotTrace(console_progress="STDOUT", verbosity="NORMAL")
+        listener.start_suite(
+            "My_Suite", {"suites": [1], "totaltests": 1, "longname": "My_Suite"}
+        )
+        listener.start_test("My Test", {"longname": "My_Suite.My Test"})
+        end_test_attributes = {
+            "status": "PASS",
+            "message": "",
+            "longname": "My_Suite.My Test",
+        }
+        with patch.object(listener.progress_box, "stream") as mock_stream:
+            listener.end_test("My Test", end_test_attributes)
+        mock_stream.write.assert_called_once()
+        mock_stream.flush.assert_called_once()
+
+    def test_progress_does_not_query_terminal(self):
+        listener = RobotTrace(console_progress="STDOUT", verbosity="NORMAL")
+        with (
+            patch("shutil.get_terminal_size") as mock_get_terminal_size,
+            patch.object(self.mock_stdout, "isatty") as mock_isatty,
+        ):
+            listener.start_suite(
+                "My_Suite", {"suites": [1], "totaltests": 1, "longname": "My_Suite"}
+            )
+            listener.start_test("My Test", {"longname": "My_Suite.My Test"})
+            end_test_attributes = {
+                "status": "PASS",
+                "message": "",
+                "longname": "My_Suite.My Test",
+            }
+            listener.end_test("My Test", end_test_attributes)
+        mock_get_terminal_size.assert_not_called()
+        mock_isatty.assert_not_called()
+
 
 class TestRobotTraceKeywords(RobotTraceTestBase):
     def setUp(self):
@@ -583,13 +936,99 @@ class TestRobotTraceLogging(RobotTraceTestBase):
         )
 
 
+class TestRobotTracePrintTrace(RobotTraceTestBase):
+    def test_print_trace_shared_stream(self):
+        import sys
+
+        with patch("sys.stdout", sys.__stdout__):
+            listener = RobotTrace(console_progress="STDOUT", colors="OFF")
+        box = listener.progress_box
+        self.assertIs(box.stream, listener.real_stdout)
+
+        with patch.object(
+            listener.real_stdout, "write", wraps=listener.real_stdout.write
+        ) as mock_write:
+            listener._print_trace("Hello")
+        mock_write.assert_called_once_with(
+            box.clear_sequence() + "Hello\n" + box.draw_sequence()
+        )
+
+    def test_print_trace_separate_stream(self):
+        with patch("sys.stderr", new_callable=StringIO) as mock_stderr:
+            listener = RobotTrace(console_progress="STDERR", colors="OFF")
+            listener._print_trace("Hello")
+        self.assertEqual(listener.real_stdout.getvalue(), "Hello\n")
+        self.assertTrue(
+            mock_stderr.getvalue().endswith(listener.progress_box.draw_sequence())
+        )
+
+
+class TestBufferedStream(unittest.TestCase):
+    def test_no_file_returns_stream(self):
+        stream = StringIO()
+        self.assertIs(_buffered_stream(stream), stream)
+
+    def test_buffers_until_flushed(self):
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as file:
+            buffered = _buffered_stream(file)
+            self.assertIsNot(buffered, file)
+            buffered.write("Hello")
+            file.seek(0)
+            self.assertEqual(file.read(), "")
+
+            buffered.flush()
+            file.seek(0)
+            self.assertEqual(file.read(), "Hello")
+
+            # Closing the buffered stream leaves the original file open.
+            buffered.close()
+            self.assertFalse(file.closed)
+            file.write("!")
+
+
+class TestRobotTraceFlush(RobotTraceTestBase):
+    def setUp(self):
+        super().setUp()
+        self.listener = RobotTrace(console_progress="NONE", verbosity="NORMAL")
+        self.listener.start_suite(
+            "My_Suite", {"suites": [1], "totaltests": 1, "longname": "My_Suite"}
+        )
+        self.listener.start_test("My Test", {"longname": "My_Suite.My Test"})
+
+    def test_write_not_flushed_when_not_tty(self):
+        self.listener._flush_writes = False
+        with patch.object(self.listener, "real_stdout") as mock_stdout:
+            self.listener._write("Hello")
+        mock_stdout.write.assert_called_once_with("Hello")
+        mock_stdout.flush.assert_not_called()
+
+    def test_write_flushed_when_tty(self):
+        self.listener._flush_writes = True
+        with patch.object(self.listener, "real_stdout") as mock_stdout:
+            self.listener._write("Hello")
+        mock_stdout.flush.assert_called_once()
+
+    def test_end_test_and_suite_flush(self):
+        self.listener._flush_writes = False
+        with patch.object(self.listener, "real_stdout") as mock_stdout:
+            self.listener.end_test(
+                "My Test",
+                {"status": "FAIL", "message": "", "longname": "My_Suite.My Test"},
+            )
+            mock_stdout.flush.assert_called_once()
+            self.listener.end_suite(
+                "My_Suite", {"status": "FAIL", "longname": "My_Suite", "message": ""}
+            )
+            self.assertEqual(mock_stdout.flush.call_count, 2)
+
+
 class TestRobotTraceClose(RobotTraceTestBase):
     def test_close_prints_summary(self):
         import sys
 
         listener = RobotTrace(console_progress="NONE", verbosity="NORMAL")
         listener.stats.top_level_test_count = 1
-        listener.stats.completed_tests = ["t1"]
+        listener.stats.completed_count = 1
 
         listener.close()
         output = sys.__stdout__.getvalue()
@@ -625,3 +1064,8 @@ class TestLiveTracePrinter(RobotTraceTestBase):
         self.assertIn("  I Hello world", output)
         self.assertIn("    Line 2", output)
         self.assertIn("  ✓ PASS", output)
+
+
+if __name__ == "__main__":
+    # Buffer output, so only failing tests show what they printed.
+    unittest.main(buffer=True)